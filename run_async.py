@@ -1,3 +1,6 @@
+import numpy as np
+
+from src.uni_async.agent import UniAsyncAgent
 from src.uni_async.model import UniAsyncModel
 
 
@@ -5,8 +8,13 @@ def run_async():
     NUM_AGENTS = 5
     NUM_MALICIOUS_AGENTS = 1
     MAX_TICKS = 200
+    VERBOSE = False
+
+    UniAsyncAgent.VERBOSE = VERBOSE
 
-    model = UniAsyncModel(N=NUM_AGENTS, malicious_nodes=NUM_MALICIOUS_AGENTS)
+    model = UniAsyncModel(
+        N=NUM_AGENTS, malicious_nodes=NUM_MALICIOUS_AGENTS, collect_data=False
+    )
     print(f"--- Starting Asynchronous Leader Election with {NUM_AGENTS} agents ---")
 
     for t in range(MAX_TICKS):
@@ -15,16 +23,13 @@ def run_async():
             print(f"\n--- Protocol finished at tick {t} ---")
             break
 
-    results = model.datacollector.get_agent_vars_dataframe()
-    last = results.xs(t, level="Step")
-    print("\nFinal state of all agents:\n", last)
-
-    leaders = last["Leader"]
+    print("\nFinal state of all agents:")
+    for a in model.agent_list:
+        print(f"  Agent {a.unique_id}: Leader={a.leader}, Phase={a.phase}")
 
-    all_non_nan = leaders.notna().all()
-    unique_leaders = leaders.dropna().unique()
+    unique_leaders = np.unique(model.leader_array)
 
-    if all_non_nan and len(unique_leaders) == 1:
+    if not model.abort_flag and unique_leaders.size == 1 and unique_leaders[0] >= 0:
         print(
             f"\n[System] ✅ SUCCESS: Consensus reached. Leader is Agent {int(unique_leaders[0])}."
         )
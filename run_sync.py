@@ -1,3 +1,5 @@
+import numpy as np
+
 from src.uni_sync.model import UniSyncModel
 
 
@@ -5,10 +7,9 @@ def run_sync():
     NUM_AGENTS = 5
     MAX_STEPS = NUM_AGENTS * 5
 
-    model = UniSyncModel(NUM_AGENTS)
+    model = UniSyncModel(NUM_AGENTS, collect_data=False)
 
     print(f"--- Starting Leader Election with {NUM_AGENTS} agents ---")
-    step_count = 0
 
     for i in range(MAX_STEPS):
         if model.all_agents_finished():
@@ -16,16 +17,17 @@ def run_sync():
             break
 
         model.step()
-        step_count += 1
 
-    results = model.datacollector.get_agent_vars_dataframe()
-    final_step_results = results.xs(step_count, level="Step")
     print("Final State of all Agents:")
-    print(final_step_results)
+    for agent in model.agents:
+        print(
+            f"  Agent {agent.unique_id}: Phase={agent.phase}, "
+            f"Random number={agent.N_rand}, Leader={agent.leader}"
+        )
 
     # Verify consensus
-    leaders = final_step_results["Leader"].dropna().unique()
-    if len(leaders) == 1:
+    leaders = np.unique(model.leader_array)
+    if leaders.size == 1 and leaders[0] >= 0:
         print(
             f"\nSUCCESS: All agents agree that the leader is Agent {int(leaders[0])}."
         )
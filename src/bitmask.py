@@ -0,0 +1,16 @@
+from functools import lru_cache
+
+
+def bitmask_ids(mask: int) -> list[int]:
+    """Return the agent ids set in an id bitmask, in ascending order."""
+    return [i for i in range(mask.bit_length()) if mask >> i & 1]
+
+
+@lru_cache(maxsize=64)
+def ranked_ids(mask: int) -> tuple[int, ...]:
+    """Return the agent ids set in an id bitmask, in descending order.
+
+    This is the order the leader pick indexes into. Every agent ends an
+    election with the same id set, so the ranking is built once per set.
+    """
+    return tuple(i for i in range(mask.bit_length() - 1, -1, -1) if mask >> i & 1)
@@ -0,0 +1,17 @@
+from typing import Any
+
+import pandas as pd
+
+
+class AgentHistory:
+    """Stand-in for the `mesa.DataCollector` the models used to expose.
+
+    Only `get_agent_vars_dataframe()` is kept; it forwards to the model,
+    which records agent state into NumPy arrays instead.
+    """
+
+    def __init__(self, model: Any) -> None:
+        self.model = model
+
+    def get_agent_vars_dataframe(self) -> pd.DataFrame:
+        return self.model.get_agent_vars_dataframe()
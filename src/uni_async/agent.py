@@ -1,14 +1,38 @@
-from collections import deque
 import random
 import mesa
-from src.uni_async.types import AsyncMessageType
-from typing import Optional
+from src.bitmask import ranked_ids
+from src.uni_async.inbox import RingInbox
+from src.uni_async.types import AsyncMessage, AsyncMessageType, RevealPairs
+from typing import Callable
 
 
 class UniAsyncAgent(mesa.Agent):
     """Asynchronous leader election consensus in a unidirectional ring."""
 
-    PUNISH_STATE = None
+    # mesa.Agent has no __slots__, so base attributes still live in __dict__.
+    __slots__ = (
+        "leader",
+        "highest",
+        "phase",
+        "id_set",
+        "N_rand_commit",
+        "N_rand_reveal",
+        "commit_from_predecessor",
+        "commit_records",
+        "reveal_from_predecessor",
+        "inbox",
+        "predecessor",
+        "successor",
+        "is_malicious",
+        "_dispatch",
+        "_N",
+        "_successor_id",
+        "_predecessor_id",
+        "_is_originator",
+    )
+
+    PUNISH_STATE = -1  # No leader; -1 also marks every unset integer field.
+    VERBOSE = False  # Trace protocol events to stdout.
 
     def __init__(self, model: mesa.Model) -> None:
         """Initialize agent state, communication buffers, and local protocol variables.
@@ -17,40 +41,69 @@ class UniAsyncAgent(mesa.Agent):
         a message inbox, random number commitments, and metadata for detecting cheating.
         """
         super().__init__(model)
-        self.leader: Optional[int] = None
+        self.leader: int = -1
         self.highest = -1
         self.phase = 0
-        self.id_set: set[int] = set()
-        self.N_rand_commit: Optional[int] = None
-        self.N_rand_reveal: Optional[int] = None
-        self.commit_from_predecessor: Optional[int] = None
+        self.id_set: int = 0  # Bitmask, bit i set when agent i is known.
+        self.N_rand_commit: int = -1
+        self.N_rand_reveal: int = -1
+        self.commit_from_predecessor: int = -1
         self.commit_records: dict[int, int] = {}
-        self.inbox: deque[dict] = deque()
+        self.reveal_from_predecessor: int = -1
+        self._N: int = model.num_agents
+        self.inbox: RingInbox = RingInbox(4 * self._N)
         self.predecessor: "UniAsyncAgent" | None = None
         self.successor: "UniAsyncAgent" | None = None
         self.is_malicious: bool = False
+        self._successor_id: int = -1
+        self._predecessor_id: int = -1
+        self._is_originator: bool = False
+        self._dispatch: dict[AsyncMessageType, Callable[[AsyncMessage], None]] = {
+            AsyncMessageType.COLLECT: self.__on_collect,
+            AsyncMessageType.SETUP: self.__on_setup,
+            AsyncMessageType.COMMIT: self.__on_commit,
+            AsyncMessageType.REVEAL: self.__on_reveal,
+            AsyncMessageType.CHOOSE: self.__on_choose,
+        }
+
+    def connect(self, predecessor: "UniAsyncAgent", successor: "UniAsyncAgent") -> None:
+        """Wire the agent into the ring.
+
+        Must be called after all agent IDs are final and before the protocol
+        starts, since both neighbours' IDs are cached and the message handlers
+        assume the links are set.
+        """
+        self.predecessor = predecessor
+        self.successor = successor
+        self._successor_id = successor.unique_id
+        self._predecessor_id = predecessor.unique_id
 
-    def send_to_successor(self, payload: dict) -> None:
+    def send_to_successor(self, payload: AsyncMessage) -> None:
         """Send a message asynchronously to the next agent in the ring.
 
         Messages are handled by the model's network, which introduces delivery delay.
         This function is used by all protocol phases to propagate messages forward.
         """
-        if self.successor:
-            self.model.network.send(self.unique_id, self.successor.unique_id, payload)
+        self.model.network.send(self.unique_id, self._successor_id, payload)
 
     def abort_protocol(self, expected: int, revealed: int) -> None:
         """Abort the election if cheating by the predecessor is detected.
 
         Triggered when a predecessor reveals a value different from its earlier commit.
-        The agent signals this to the model by setting the abort flag.
+        The agent signals this to the model by setting the abort flag. Every
+        agent is punished at once, including those that already finished, since
+        the model stops stepping agents after an abort.
         """
-        print(
-            f"[Agent {self.unique_id}] detected cheating by predecessor! "
-            f"Committed {expected}, revealed {revealed}"
-        )
+        if UniAsyncAgent.VERBOSE:
+            print(
+                f"[Agent {self.unique_id}] detected cheating by predecessor! "
+                f"Committed {expected}, revealed {revealed}"
+            )
         self.model.abort_flag = True
-        self.leader = UniAsyncAgent.PUNISH_STATE
+        for agent in self.model.agent_list:
+            agent.leader = UniAsyncAgent.PUNISH_STATE
+        self.model.state_dirty = True
+        self.model.deactivate(self)
 
     def start_protocol(self) -> None:
         """Start the leader election by initiating the COLLECT phase.
@@ -61,233 +114,227 @@ class UniAsyncAgent(mesa.Agent):
         """
         if self.phase != 0:
             return
-        print(f"[Agent {self.unique_id}] starts protocol.")
+        if UniAsyncAgent.VERBOSE:
+            print(f"[Agent {self.unique_id}] starts protocol.")
         self.highest = self.unique_id
         self.phase = 1
-        self.id_set.add(self.unique_id)
+        self.id_set = 1 << self.unique_id
         self.send_to_successor(
-            {
-                "message_type": AsyncMessageType.COLLECT,
-                "sender_id": self.unique_id,
-                "content": {"id_set": list(self.id_set)},
-            }
+            AsyncMessage(AsyncMessageType.COLLECT, self.unique_id, self.id_set)
         )
 
     def step(self) -> None:
-        """Process one pending message per tick.
+        """Process pending messages, up to the model's per-tick cap.
 
-        The agent dequeues a message, identifies its type, and delegates handling
-        to the appropriate phase-specific method. If the protocol was aborted,
-        no further actions are taken.
+        The agent dequeues messages in arrival order and looks up the
+        phase-specific handler for each type in the dispatch table. If the
+        protocol was aborted, no further actions are taken.
         """
-        if self.model.abort_flag:
-            self.leader = UniAsyncAgent.PUNISH_STATE
-            return
-        if not self.inbox:
+        if self.model.abort_flag or not self.inbox:
             return
-        message = self.inbox.popleft()
-        mtype: AsyncMessageType = message["payload"]["message_type"]
-        match mtype:
-            case AsyncMessageType.COLLECT:
-                self.__on_collect(message)
-            case AsyncMessageType.SETUP:
-                self.__on_setup(message)
-            case AsyncMessageType.COMMIT:
-                self.__on_commit(message)
-            case AsyncMessageType.REVEAL:
-                self.__on_reveal(message)
-            case AsyncMessageType.CHOOSE:
-                self.__on_choose(message)
-
-    def __on_collect(self, message: dict) -> None:
+        self.model.state_dirty = True
+        budget = self.model.max_messages_per_tick
+        while budget and self.inbox and not self.model.abort_flag:
+            message: AsyncMessage = self.inbox.pop()
+            handler = self._dispatch.get(message.mtype)
+            if handler:
+                handler(message)
+            budget -= 1
+
+    def __on_collect(self, message: AsyncMessage) -> None:
         """Handle COLLECT messages used to gather all agent IDs.
 
         Each agent appends its ID and forwards the message. When the originator
         receives the message containing all unique IDs, it transitions to SETUP.
         """
-        payload = message["payload"]
-        originator_id = payload["sender_id"]
-        id_set = set(payload["content"]["id_set"])
+        originator_id = message.sender
+        id_set = message.id_set
         if originator_id > self.highest and self.phase <= 1:
             self.highest = originator_id
-            id_set.add(self.unique_id)
             self.send_to_successor(
-                {
-                    "message_type": AsyncMessageType.COLLECT,
-                    "sender_id": originator_id,
-                    "content": {"id_set": list(id_set)},
-                }
+                AsyncMessage(
+                    AsyncMessageType.COLLECT,
+                    originator_id,
+                    id_set | 1 << self.unique_id,
+                )
             )
-        elif originator_id == self.unique_id and len(id_set) == self.model.num_agents:
+        elif originator_id == self.unique_id and id_set.bit_count() == self._N:
             self.phase = 2
-            self.id_set = id_set.copy()
-            print(f"[Agent {self.unique_id}] starts SETUP phase.")
+            self._is_originator = True
+            self.id_set = id_set
+            if UniAsyncAgent.VERBOSE:
+                print(f"[Agent {self.unique_id}] starts SETUP phase.")
             self.send_to_successor(
-                {
-                    "message_type": AsyncMessageType.SETUP,
-                    "sender_id": originator_id,
-                    "content": {"id_set": list(id_set)},
-                }
+                AsyncMessage(AsyncMessageType.SETUP, originator_id, id_set)
             )
 
-    def __on_setup(self, message: dict) -> None:
+    def __on_setup(self, message: AsyncMessage) -> None:
         """Handle SETUP messages and create random commitments.
 
         Each agent selects a random number (commit) and, if malicious, decides a
         different reveal value. The commit is sent to the successor, and when the
         originator gets its SETUP message back, it starts the REVEAL phase.
         """
-        payload = message["payload"]
-        originator_id = payload["sender_id"]
-        id_set = set(payload["content"]["id_set"])
+        originator_id = message.sender
 
         if originator_id != self.highest:
             return
 
         if not self.id_set:
-            self.id_set = id_set.copy()
+            self.id_set = message.id_set
 
         if self.phase < 2 or (self.is_malicious and self.unique_id == originator_id):
             self.phase = 2
-            self.N_rand_commit = random.randint(0, self.model.num_agents - 1)
+            self.N_rand_commit = random.randint(0, self._N - 1)
             if self.is_malicious:
-                diff = random.randint(1, self.model.num_agents - 1)
-                self.N_rand_reveal = (self.N_rand_commit + diff) % self.model.num_agents
-                print(
-                    f"[Agent {self.unique_id}] MALICIOUS: committing {self.N_rand_commit} "
-                    f"but will reveal {self.N_rand_reveal}."
-                )
+                diff = random.randint(1, self._N - 1)
+                self.N_rand_reveal = (self.N_rand_commit + diff) % self._N
+                if UniAsyncAgent.VERBOSE:
+                    print(
+                        f"[Agent {self.unique_id}] MALICIOUS: committing {self.N_rand_commit} "
+                        f"but will reveal {self.N_rand_reveal}."
+                    )
             else:
                 self.N_rand_reveal = self.N_rand_commit
 
             self.send_to_successor(
-                {
-                    "message_type": AsyncMessageType.COMMIT,
-                    "sender_id": self.unique_id,
-                    "content": {"N_rand": self.N_rand_commit},
-                }
+                AsyncMessage(
+                    AsyncMessageType.COMMIT, self.unique_id, extra=self.N_rand_commit
+                )
             )
 
         if self.unique_id != originator_id:
-            self.send_to_successor(message["payload"])
+            self.send_to_successor(message)
         else:
             self.phase = 3
-            print(f"[Agent {self.unique_id}] starts REVEAL phase.")
+            if UniAsyncAgent.VERBOSE:
+                print(f"[Agent {self.unique_id}] starts REVEAL phase.")
             self.send_to_successor(
-                {
-                    "message_type": AsyncMessageType.REVEAL,
-                    "sender_id": originator_id,
-                    "content": {
-                        "id_set": list(self.id_set),
-                        "pairs": [],
-                        "last_author": None,
-                    },
-                }
+                AsyncMessage(
+                    AsyncMessageType.REVEAL,
+                    originator_id,
+                    self.id_set,
+                    RevealPairs.allocate(self._N),
+                )
             )
 
-    def __on_commit(self, message: dict) -> None:
+    def __on_commit(self, message: AsyncMessage) -> None:
         """Handle COMMIT messages and store predecessor's committed number.
 
         Each agent records its predecessor's commit in both local and global
         dictionaries. This value is later compared with the revealed one for
-        integrity verification during the REVEAL phase.
+        integrity verification during the REVEAL phase. A commit that arrives
+        after the predecessor's reveal is checked against it immediately.
         """
-        payload = message["payload"]
-        predecessor_id = payload["sender_id"]
-        N_predecessor = payload["content"]["N_rand"]
-        if self.predecessor and predecessor_id != self.predecessor.unique_id:
+        predecessor_id = message.sender
+        N_predecessor = message.extra
+        if predecessor_id != self._predecessor_id:
             return
         self.commit_from_predecessor = N_predecessor
         self.commit_records[predecessor_id] = N_predecessor
-        self.send_to_successor(message["payload"])
+        self.send_to_successor(message)
+        revealed = self.reveal_from_predecessor
+        if revealed != -1 and revealed != N_predecessor:
+            self.abort_protocol(N_predecessor, revealed)
 
-    def __on_reveal(self, message: dict) -> None:
+    def __on_reveal(self, message: AsyncMessage) -> None:
         """Handle REVEAL messages and verify all commitments.
 
         Agents check that revealed numbers match previously received commits.
         If a mismatch is detected, the protocol is aborted and cheating is logged.
         Once all reveals are collected, the originator computes and announces the leader.
         """
-        payload = message["payload"]
-        originator_id = payload["sender_id"]
-        id_set = set(payload["content"]["id_set"])
-        pairs: list[tuple[int, int]] = list(payload["content"]["pairs"])
-        last_author = payload["content"]["last_author"]
+        originator_id = message.sender
+        id_set = message.id_set
+        pairs: RevealPairs = message.pairs
+        seen_authors = message.seen_authors
+        last_author = message.last_author
         if not self.id_set or id_set != self.id_set:
             return
-        for pid, revealed_val in pairs:
-            if pid in self.commit_records:
-                if revealed_val != self.commit_records[pid]:
-                    self.abort_protocol(self.commit_records[pid], revealed_val)
-                    return
-        if last_author is not None and self.predecessor:
-            if last_author == self.predecessor.unique_id:
-                if not pairs or self.commit_from_predecessor is None:
-                    return
-                if pairs[-1][1] != self.commit_from_predecessor:
-                    self.abort_protocol(self.commit_from_predecessor, pairs[-1][1])
+        for pid, committed_val in self.commit_records.items():
+            if seen_authors >> pid & 1:
+                revealed_val = pairs.value_of(pid)
+                if revealed_val != committed_val:
+                    self.abort_protocol(committed_val, revealed_val)
                     return
-        if all(pid != self.unique_id for pid, _ in pairs):
-            if self.N_rand_reveal is None:
-                if self.N_rand_commit is None:
-                    self.N_rand_commit = random.randint(0, self.model.num_agents - 1)
+        if seen_authors >> self._predecessor_id & 1:
+            self.reveal_from_predecessor = pairs.value_of(self._predecessor_id)
+        if self.phase == 5 and self.reveal_from_predecessor != -1:
+            self.model.deactivate(self)
+        if last_author == self._predecessor_id:
+            if not pairs.count or self.commit_from_predecessor == -1:
+                return
+            revealed = pairs.value_of(last_author)
+            if revealed != self.commit_from_predecessor:
+                self.abort_protocol(self.commit_from_predecessor, revealed)
+                return
+        if not seen_authors >> self.unique_id & 1:
+            if self.N_rand_reveal == -1:
+                if self.N_rand_commit == -1:
+                    self.N_rand_commit = random.randint(0, self._N - 1)
                 self.N_rand_reveal = self.N_rand_commit
-            pairs.append((self.unique_id, int(self.N_rand_reveal)))
+            pairs = pairs.with_pair(self.unique_id, self.N_rand_reveal)
+            seen_authors |= 1 << self.unique_id
         self.send_to_successor(
-            {
-                "message_type": AsyncMessageType.REVEAL,
-                "sender_id": originator_id,
-                "content": {
-                    "id_set": list(id_set),
-                    "pairs": pairs,
-                    "last_author": self.unique_id,
-                },
-            }
+            AsyncMessage(
+                AsyncMessageType.REVEAL,
+                originator_id,
+                id_set,
+                pairs,
+                last_author=self.unique_id,
+                seen_authors=seen_authors,
+            )
         )
-        if self.unique_id == originator_id and len(pairs) == self.model.num_agents:
-            total = sum(v for _, v in pairs)
-            N = total % self.model.num_agents
-            leader_id = int(sorted(id_set, reverse=True)[N])
-            self.leader = leader_id
+        if self._is_originator and pairs.count == self._N:
+            self.__finalize_election(id_set, pairs)
+
+    def __finalize_election(self, id_set: int, pairs: RevealPairs) -> None:
+        """Compute the leader from all reveals and start the CHOOSE broadcast.
+
+        Only the originator runs this, once its REVEAL message returns with a
+        pair from every agent.
+        """
+        N = pairs.total() % self._N
+        leader_id = ranked_ids(id_set)[N]
+        self.leader = leader_id
+        if UniAsyncAgent.VERBOSE:
             print(
                 f"[Agent {self.unique_id}] elected leader {leader_id}. Broadcasting result."
             )
-            self.send_to_successor(
-                {
-                    "message_type": AsyncMessageType.CHOOSE,
-                    "sender_id": originator_id,
-                    "content": {
-                        "id_set": list(id_set),
-                        "pairs": pairs,
-                        "leader": leader_id,
-                    },
-                }
+        self.send_to_successor(
+            AsyncMessage(
+                AsyncMessageType.CHOOSE,
+                self.unique_id,
+                id_set,
+                pairs,
+                extra=leader_id,
             )
+        )
 
-    def __on_choose(self, message: dict) -> None:
+    def __on_choose(self, message: AsyncMessage) -> None:
         """Handle CHOOSE messages to finalize and distribute the leader decision.
 
         The elected leader ID is propagated around the ring so all agents agree
         on the result. Each agent records the leader and reports completion to
-        the model once it receives confirmation.
+        the model once it receives confirmation. Agents that have also seen
+        their predecessor's reveal have nothing left to verify and are removed
+        from the model's set of active agents.
         """
-        payload = message["payload"]
-        leader_id = payload["content"]["leader"]
-        id_set = set(payload["content"]["id_set"])
-        if self.id_set != id_set:
+        leader_id = message.extra
+        if message.id_set != self.id_set:
             return
         self.leader = leader_id
         self.phase = 5
-        self.send_to_successor(message["payload"])
-        if self == self.model.starter:
-            self.model.register_leader_report(self.unique_id)
+        self.send_to_successor(message)
+        self.model.register_leader_report(self.unique_id, leader_id)
         if self.model.starter and self != self.model.starter:
-            self.model.starter.inbox.append(
-                {
-                    "payload": {
-                        "message_type": AsyncMessageType.CHOOSE,
-                        "sender_id": self.unique_id,
-                        "content": {"leader": leader_id, "id_set": list(self.id_set)},
-                    }
-                }
+            self.model.starter.inbox.push(
+                AsyncMessage(
+                    AsyncMessageType.CHOOSE,
+                    self.unique_id,
+                    self.id_set,
+                    extra=leader_id,
+                )
             )
+        if self.reveal_from_predecessor != -1:
+            self.model.deactivate(self)
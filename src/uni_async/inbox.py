@@ -0,0 +1,54 @@
+from typing import Any
+
+
+def next_pow2(n: int) -> int:
+    """Return the smallest power of two that is greater than or equal to `n`."""
+    return 1 << max(0, n - 1).bit_length()
+
+
+class RingInbox:
+    """Single-producer, single-consumer FIFO backed by a preallocated list.
+
+    Capacity is always a power of two, so head/tail indices wrap with a
+    bit mask instead of a modulo. Indices grow monotonically; if the buffer
+    ever fills up, it is reallocated at twice the size.
+    """
+
+    __slots__ = ("buf", "mask", "head", "tail")
+
+    def __init__(self, capacity: int) -> None:
+        capacity = next_pow2(capacity)
+        self.buf: list[Any] = [None] * capacity
+        self.mask = capacity - 1
+        self.head = 0
+        self.tail = 0
+
+    def __len__(self) -> int:
+        return self.tail - self.head
+
+    def __bool__(self) -> bool:
+        return self.tail != self.head
+
+    def push(self, item: Any) -> None:
+        if self.tail - self.head > self.mask:
+            self._grow()
+        self.buf[self.tail & self.mask] = item
+        self.tail += 1
+
+    def pop(self) -> Any:
+        if self.tail == self.head:
+            raise IndexError("pop from an empty RingInbox")
+        idx = self.head & self.mask
+        item = self.buf[idx]
+        self.buf[idx] = None
+        self.head += 1
+        return item
+
+    def _grow(self) -> None:
+        size = self.tail - self.head
+        buf = [self.buf[(self.head + i) & self.mask] for i in range(size)]
+        buf.extend([None] * size)
+        self.buf = buf
+        self.mask = len(buf) - 1
+        self.head = 0
+        self.tail = size
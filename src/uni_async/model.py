@@ -1,9 +1,12 @@
 import random
 import mesa
 import networkx as nx
+import numpy as np
+import pandas as pd
 from src.uni_async.agent import UniAsyncAgent
 from src.uni_async.network import UniAsyncNetwork
-from typing import Iterable, Optional
+from src.uni_async.types import AsyncMessage
+from src.history import AgentHistory
 
 
 class UniAsyncModel(mesa.Model):
@@ -12,10 +15,17 @@ class UniAsyncModel(mesa.Model):
         N: int,
         max_message_delay: int = 5,
         malicious_nodes: int | None = None,
+        max_messages_per_tick: int | None = None,
+        collect_data: bool = True,
     ) -> None:
         super().__init__()
 
         self.num_agents = N
+        self.collect_data = collect_data
+        # Per-agent inbox drain cap, so one busy agent cannot starve the rest.
+        self.max_messages_per_tick = (
+            N if max_messages_per_tick is None else max(1, max_messages_per_tick)
+        )
         self.ticks = 0
         self.random_gen = random.Random()
         self.abort_flag = False
@@ -30,16 +40,21 @@ class UniAsyncModel(mesa.Model):
 
         self.starter: UniAsyncAgent | None = None
         self.received_leader_reports: set[int] = set()
+        self.leader_array = np.full(N, -1, dtype=np.int64)
 
-        def delay_fcn(_payload: dict) -> int:
+        def delay_fcn(_payload: AsyncMessage) -> int:
             return self.random_gen.randint(1, max_message_delay)
 
-        self.network = UniAsyncNetwork(self, delay_fcn)
+        self.network = UniAsyncNetwork(self, delay_fcn, max_message_delay)
         self.agent_list: list[UniAsyncAgent] = []
 
+        ids = np.arange(N)
+        successors = np.roll(ids, -1).tolist()
+        predecessors = np.roll(ids, 1).tolist()
+
         graph = nx.DiGraph()
-        for i in range(self.num_agents):
-            graph.add_node(i)
+        graph.add_nodes_from(range(N))
+        graph.add_edges_from(zip(range(N), successors))
         self.grid = mesa.space.NetworkGrid(graph)
 
         for i in range(self.num_agents):
@@ -49,18 +64,27 @@ class UniAsyncModel(mesa.Model):
             self.agent_list.append(a)
             self.grid.place_agent(a, i)
 
-        for i in range(self.num_agents):
-            a = self.agent_list[i]
-            a.successor = self.agent_list[(i + 1) % self.num_agents]
-            a.predecessor = self.agent_list[(i - 1) % self.num_agents]
+        agents = self.agent_list
+        for a, p, s in zip(agents, predecessors, successors):
+            a.connect(predecessor=agents[p], successor=agents[s])
+
+        # Insertion-ordered so agents keep stepping in ring order.
+        self._active: dict[UniAsyncAgent, None] = dict.fromkeys(self.agent_list)
 
         starter = random.choice(self.agent_list)
         self.starter = starter
         starter.start_protocol()
 
-        self.datacollector = mesa.DataCollector(
-            agent_reporters={"Leader": "leader", "Phase": "phase"}
-        )
+        # Leader and phase of every agent, recorded only on steps where some
+        # agent handled a message (`state_dirty`); grown by doubling.
+        self._hist_leader = np.full((64, N), -1, dtype=np.int32)
+        self._hist_phase = np.zeros((64, N), dtype=np.int8)
+        self._hist_step = np.zeros(64, dtype=np.int64)
+        self._history_len = 0
+        # Kept for callers of `model.datacollector.get_agent_vars_dataframe()`.
+        self.datacollector = AgentHistory(self)
+        self._num_steps = 0
+        self.state_dirty = True
 
         if self.malicious_ids:
             print(f"[Model] Malicious agents: {sorted(self.malicious_ids)}")
@@ -73,10 +97,14 @@ class UniAsyncModel(mesa.Model):
             return
 
         self.network.step()
-        for a in self.agent_list:
+        for a in list(self._active):
             a.step()
 
-        self.datacollector.collect(self)
+        if self.collect_data:
+            self._num_steps += 1
+            if self.state_dirty:
+                self._record_history()
+                self.state_dirty = False
         self.ticks += 1
 
         if self.all_finished():
@@ -87,18 +115,57 @@ class UniAsyncModel(mesa.Model):
             else:
                 print(
                     f"[Model] ✅ Consensus complete after {self.ticks} ticks. "
-                    f"All {len(self.received_leader_reports)} leader reports received by starter "
-                    f"(Agent {self.starter.unique_id})."
+                    f"All {self.num_agents} agents decided, starter was "
+                    f"Agent {self.starter.unique_id}."
                 )
 
-    def register_leader_report(self, agent_id: int) -> None:
+    def _record_history(self) -> None:
+        t = self._history_len
+        if t == len(self._hist_leader):
+            self._hist_leader = np.concatenate(
+                [self._hist_leader, np.full_like(self._hist_leader, -1)]
+            )
+            self._hist_phase = np.concatenate(
+                [self._hist_phase, np.zeros_like(self._hist_phase)]
+            )
+            self._hist_step = np.concatenate(
+                [self._hist_step, np.zeros_like(self._hist_step)]
+            )
+        self._hist_leader[t] = [a.leader for a in self.agent_list]
+        self._hist_phase[t] = [a.phase for a in self.agent_list]
+        self._hist_step[t] = self._num_steps
+        self._history_len = t + 1
+
+    def get_agent_vars_dataframe(self) -> pd.DataFrame:
+        """Per-step agent state, indexed by (Step, AgentID) like Mesa's DataCollector.
+
+        Steps without a recorded row repeat the last recorded one. Columns
+        are int64, and an agent without a leader shows -1 rather than NaN.
+        """
+        recorded = self._hist_step[: self._history_len]
+        rows = np.searchsorted(recorded, np.arange(1, self._num_steps + 1), "right")
+        leader = self._hist_leader[rows - 1]
+        phase = self._hist_phase[rows - 1]
+        steps, agent_ids = np.indices(leader.shape)
+        index = pd.MultiIndex.from_arrays(
+            [steps.ravel() + 1, agent_ids.ravel()], names=["Step", "AgentID"]
+        )
+        return pd.DataFrame(
+            {"Leader": leader.ravel(), "Phase": phase.ravel()},
+            index=index,
+            dtype=np.int64,
+        )
+
+    def register_leader_report(self, agent_id: int, leader_id: int) -> None:
         self.received_leader_reports.add(agent_id)
+        self.leader_array[agent_id] = leader_id
+
+    def deactivate(self, agent: UniAsyncAgent) -> None:
+        """Stop stepping an agent that has no further protocol work."""
+        self._active.pop(agent, None)
 
     def all_finished(self) -> bool:
         if self.abort_flag:
             return True
 
-        if not self.starter:
-            return False
-
-        return len(self.received_leader_reports) == self.num_agents
+        return not self._active
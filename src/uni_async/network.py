@@ -1,20 +1,30 @@
 import heapq
-from typing import Any, Callable
+from typing import Callable
 import mesa
-from src.uni_async.types import PendingMessage
+from src.uni_async.types import AsyncMessage, PendingMessage
 
 
 class UniAsyncNetwork:
+    """Delivers messages after a random delay using a timing wheel.
+
+    Slot `t % W` holds the messages due at tick `t`, in send order. Delays
+    that do not fit within the wheel's horizon fall back to a small heap.
+    """
 
     def __init__(
-        self, model: mesa.Model, delay_fcn: Callable[[dict[str, Any]], int]
+        self,
+        model: mesa.Model,
+        delay_fcn: Callable[[AsyncMessage], int],
+        max_delay: int,
     ) -> None:
         self.model = model
         self.delay_fcn = delay_fcn
-        self._pq: list[PendingMessage] = []
+        self._W = max(1, max_delay) + 1
+        self._wheel: list[list[PendingMessage]] = [[] for _ in range(self._W)]
+        self._overflow: list[PendingMessage] = []
         self._seq = 0
 
-    def send(self, source: int, dest: int, payload: dict[str, Any]) -> None:
+    def send(self, source: int, dest: int, payload: AsyncMessage) -> None:
         delay = max(1, self.delay_fcn(payload))
         deliver_at = self.model.ticks + delay  # type: ignore
 
@@ -26,16 +36,20 @@ class UniAsyncNetwork:
             payload=payload,
         )
         self._seq += 1
-        heapq.heappush(self._pq, message)
+        if delay < self._W:
+            self._wheel[deliver_at % self._W].append(message)
+        else:
+            heapq.heappush(self._overflow, message)
 
     def step(self) -> None:
-        while self._pq and self._pq[0].deliver_at <= self.model.ticks:  # type: ignore
-            message = heapq.heappop(self._pq)
-            agent = self.model.agents[message.dest]
-            agent.inbox.append(  # type: ignore
-                {
-                    "source": message.source,
-                    "dest": message.dest,
-                    "payload": message.payload,
-                }
-            )
+        ticks = self.model.ticks  # type: ignore
+        bucket = self._wheel[ticks % self._W]
+        overflow = self._overflow
+        if overflow and overflow[0].deliver_at <= ticks:
+            while overflow and overflow[0].deliver_at <= ticks:
+                bucket.append(heapq.heappop(overflow))
+            bucket.sort(key=lambda m: m.seq)
+        agents = self.model.agent_list  # type: ignore
+        for message in bucket:
+            agents[message.dest].inbox.push(message.payload)  # type: ignore
+        bucket.clear()
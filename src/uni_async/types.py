@@ -1,20 +1,75 @@
 from dataclasses import dataclass
-from enum import Enum
-from typing import Any
+from enum import IntEnum
+from typing import NamedTuple
 
+import numpy as np
 
-class AsyncMessageType(str, Enum):
-    COLLECT = "Collect"
-    SETUP = "Setup"
-    COMMIT = "Commit"
-    REVEAL = "Reveal"
-    CHOOSE = "Choose"
 
+class AsyncMessageType(IntEnum):
+    COLLECT = 0
+    SETUP = 1
+    COMMIT = 2
+    REVEAL = 3
+    CHOOSE = 4
 
-@dataclass(order=True)
+
+class RevealPairs(NamedTuple):
+    """Revealed values stored in one array indexed by author id.
+
+    The originator allocates the array once per REVEAL round. Each hop
+    writes its value into its own slot and forwards a new tuple with the
+    count bumped, so the array itself is never copied. Slots of agents that
+    have not revealed yet stay 0.
+
+    Every message derived from one REVEAL, including the CHOOSE that
+    carries the final pairs, shares this array. That is only safe because
+    a single REVEAL circulates per election and each author writes its
+    slot at most once (guarded by `seen_authors`). A re-sent or duplicated
+    REVEAL must allocate its own `RevealPairs`.
+    """
+
+    values: np.ndarray
+    count: int = 0
+
+    @classmethod
+    def allocate(cls, capacity: int) -> "RevealPairs":
+        return cls(np.zeros(capacity, np.int64))
+
+    def with_pair(self, author: int, value: int) -> "RevealPairs":
+        assert self.count < len(self.values), "more reveals than agents"
+        self.values[author] = value
+        return RevealPairs(self.values, self.count + 1)
+
+    def value_of(self, author: int) -> int:
+        """Return the value revealed by `author`, who must have a pair."""
+        return int(self.values[author])
+
+    def total(self) -> int:
+        return int(self.values.sum())
+
+
+class AsyncMessage(NamedTuple):
+    """Flat protocol message passed between agents.
+
+    `extra` carries the committed number for COMMIT and the elected
+    leader for CHOOSE; it is unused by the other message types.
+    `id_set` and `seen_authors` are bitmasks with bit i set for agent i;
+    `seen_authors` marks which slots of `pairs` have been written.
+    """
+
+    mtype: AsyncMessageType
+    sender: int
+    id_set: int = 0
+    pairs: RevealPairs | None = None
+    last_author: int = -1
+    extra: int = -1
+    seen_authors: int = 0
+
+
+@dataclass(order=True, slots=True)
 class PendingMessage:
     deliver_at: int
     seq: int
     source: int
     dest: int
-    payload: dict[str, Any]
+    payload: AsyncMessage
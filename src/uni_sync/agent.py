@@ -1,25 +1,65 @@
 import random
-from typing import Self
+from typing import Any, Callable, Self
 
 import mesa
+import numpy as np
 
+from src.bitmask import ranked_ids
 from src.uni_sync.types import Message, MessageType
 
 
-class UniSyncAgent(mesa.Agent):
-    PUNISH_STATE = None  # If something goes wrong, no leader should be chosen.
+class StateField:
+    """Agent attribute backed by the agent's row in `model.state`.
+
+    Reads go through the column views cached in `model.state_columns`, so
+    no field view is rebuilt per access.
+    """
+
+    def __set_name__(self, owner: type, name: str) -> None:
+        self.name = name
+
+    def __get__(self, agent: Any, owner: type | None = None) -> Any:
+        if agent is None:
+            return self
+        return int(agent._columns[self.name][agent._row])
 
-    def __init__(self, model: mesa.Model) -> None:
+    def __set__(self, agent: Any, value: int) -> None:
+        agent._columns[self.name][agent._row] = value
+
+
+class UniSyncAgent(mesa.Agent):
+    # mesa.Agent has no __slots__, so base attributes still live in __dict__.
+    # The StateField attributes below are class-level descriptors, not slots.
+    __slots__ = (
+        "id_set",
+        "all_N_rand",
+        "received",
+        "inbox",
+        "successor",
+        "_row",
+        "_columns",
+    )
+
+    PUNISH_STATE = -1  # If something goes wrong, no leader should be chosen.
+
+    # Scalar protocol state lives in the model's `state` array (see
+    # `AGENT_DTYPE`), so the model can update it column-wise.
+    phase = StateField()
+    highest = StateField()
+    count = StateField()
+    leader = StateField()
+    N_rand = StateField()
+
+    def __init__(self, model: mesa.Model, row: int) -> None:
         super().__init__(model)
 
-        self.leader: int | None = None
+        self._row = row  # This agent's row in `model.state`.
+        self._columns: dict[str, np.ndarray] = model.state_columns  # type: ignore
 
-        self.highest = -1  # Highest message originator seen.
-        self.phase = 0  # Current protocol phase.
-        self.count = 0  # Message trip count.
-        self.id_set: set[int] = set()  # All agent ids seen.
-        self.N_rand: int = -1
-        self.all_N_rand: dict[int, int] = {}  # Received random numbers.
+        self.id_set: int = 0  # Bitmask of all agent ids seen.
+        # Received random numbers, indexed by sender id.
+        self.all_N_rand = np.zeros(model.num_agents, dtype=np.int32)  # type: ignore
+        self.received = np.zeros(model.num_agents, dtype=np.bool_)  # type: ignore
 
         self.inbox: list[Message] = []
         self.successor: Self | None = None
@@ -37,16 +77,21 @@ class UniSyncAgent(mesa.Agent):
         self.highest = self.unique_id
         self.count = self.model.num_agents  # type: ignore
         self.phase = 1
-        self.id_set.add(self.unique_id)
+        self.id_set = 1 << self.unique_id
 
-        first_collect_message: Message = {
-            "message_type": MessageType.COLLECT,
-            "sender_id": self.unique_id,
-            "payload": self.id_set,
-        }
+        first_collect_message = Message(
+            MessageType.COLLECT, self.unique_id, self.id_set
+        )
 
         self.send_to_successor(first_collect_message)
 
+    def _with_own_id(self, id_set: int) -> int:
+        """Add this agent to an id bitmask, reusing it if already present."""
+
+        if id_set >> self.unique_id & 1:
+            return id_set
+        return id_set | 1 << self.unique_id
+
     def send_to_successor(self, message: Message) -> None:
         """Sends a message to agent's successor in the ring."""
 
@@ -60,125 +105,19 @@ class UniSyncAgent(mesa.Agent):
         will execute this at the same time.
         """
 
-        if self.leader is not None:
+        if self.leader >= 0:
             return
 
-        if self.phase > 0:
-            self.count -= 1
-
-        messages: list[Message] = self.inbox.copy()
-        self.inbox.clear()
-
-        for message in messages:
-            message_type = message["message_type"]
-            sender_id = message["sender_id"]
-            payload = message["payload"]
-
-            match message_type:
-                case MessageType.COLLECT:
-                    if self.phase == 0:
-                        """
-                        Sanity check. Agent is joining the protocol here.
-                        Represents `UponWaking`,
-                        but the agent itself is not the originator.
-                        """
-
-                        self.phase = 1
-                        self.highest = sender_id
-                        self.id_set = payload | {self.unique_id}
-                        self.count = self.model.num_agents  # type: ignore
-
-                        first_collect_message: Message = {
-                            "message_type": MessageType.COLLECT,
-                            "sender_id": self.highest,
-                            "payload": self.id_set,
-                        }
-                        self.send_to_successor(first_collect_message)
-
-                    if self.phase == 1 and sender_id > self.highest:
-                        """
-                        FIRST MESSAGE PASS.
-                        If the agent protocol is in the phase 1 but
-                        the agent is not the message originator,
-                        it just passes on the message to its' successor.
-                        """
-
-                        self.highest = sender_id
-                        self.id_set = payload | {self.unique_id}
-                        self.count = self.model.num_agents  # type: ignore
-
-                        new_collect_message: Message = {
-                            "message_type": MessageType.COLLECT,
-                            "sender_id": self.highest,
-                            "payload": self.id_set,
-                        }
-                        self.send_to_successor(new_collect_message)
-
-                    elif sender_id == self.highest and self.unique_id == self.highest:
-                        """
-                        First round trip of the message,
-                        originator got its' message back.
-                        Originator checks if the message round trip number
-                        is equal to number of agents
-                        and starts phase 2.
-                        """
-
-                        if not (
-                            len(payload) == self.model.num_agents  # type: ignore
-                            and self.phase == 1
-                            and self.count == 0
-                        ):
-                            self.leader = UniSyncAgent.PUNISH_STATE
-                            return
-
-                        self.phase = 2
-                        self.id_set = payload.copy()
-                        self.count = self.model.num_agents  # type: ignore
-
-                        setup_message: Message = {
-                            "message_type": MessageType.SETUP,
-                            "sender_id": self.unique_id,
-                            "payload": self.id_set,
-                        }
-                        self.send_to_successor(setup_message)
-                        continue
-
-                case MessageType.SETUP:
-                    """
-                    Agents check if the round trip of their
-                    message is equal to number of agents.
-                    Also, the sender of the message should be
-                    the same as highest agent has seen (a.k.a. originator should've sent the message).
-                    """
-
-                    if self.phase > 1:
-                        continue
-
-                    if not (
-                        sender_id == self.highest
-                        and self.phase == 1
-                        and self.count == 0
-                        and len(payload) == self.model.num_agents  # type: ignore
-                    ):
-                        self.leader = UniSyncAgent.PUNISH_STATE
-                        return
-
-                    self.phase = 2
-                    self.id_set = payload.copy()
-                    self.count = self.model.num_agents  # type: ignore
-                    self.send_to_successor(message)
-                    continue
-
-                case MessageType.RANDOM:
-                    """
-                    Invokes sending a random number from message
-                    originator to successor.
-                    """
-
-                    if sender_id not in self.all_N_rand:
-                        self.all_N_rand[sender_id] = payload
-                        self.send_to_successor(message)
-                        continue
+        num_agents: int = self.model.num_agents  # type: ignore
+        uid = self.unique_id
+
+        # `count` was already decremented for this round by the model.
+
+        # The model swaps in a fresh inbox every round, so it is read in place.
+        for message in self.inbox:
+            handler = _HANDLERS.get(message.message_type)
+            if handler and not handler(self, message):
+                return
 
         if self.phase == 2 and self.count == 0:
             """
@@ -187,16 +126,14 @@ class UniSyncAgent(mesa.Agent):
             """
 
             self.phase = 3
-            self.count = self.model.num_agents  # type: ignore
+            self.count = num_agents
 
-            self.N_rand = random.randint(0, self.model.num_agents - 1)  # type: ignore
-            self.all_N_rand[self.unique_id] = self.N_rand
+            N_rand = random.randint(0, num_agents - 1)
+            self.N_rand = N_rand
+            self.all_N_rand[uid] = N_rand
+            self.received[uid] = True
 
-            rand_message: Message = {
-                "message_type": MessageType.RANDOM,
-                "sender_id": self.unique_id,
-                "payload": self.N_rand,
-            }
+            rand_message = Message(MessageType.RANDOM, uid, N_rand)
 
             self.send_to_successor(rand_message)
             return
@@ -207,11 +144,131 @@ class UniSyncAgent(mesa.Agent):
             don't get as many random numbers as there are agents, they hault.
             """
 
-            if len(self.all_N_rand) != self.model.num_agents:  # type: ignore
+            num_received = int(np.count_nonzero(self.received))
+            if num_received != num_agents:
                 self.leader = UniSyncAgent.PUNISH_STATE
                 return
 
-            total_sum = sum(self.all_N_rand.values())
-            N = total_sum % len(self.all_N_rand)
+            N = int(self.all_N_rand.sum()) % num_received
+
+            leader = ranked_ids(self.id_set)[N]
+            self.leader = leader
+            self.model.register_leader_report(uid, leader)  # type: ignore
+
+
+# Message handlers. Each returns False when the agent has been punished and
+# must stop processing this round.
+
+
+def _on_collect(agent: UniSyncAgent, message: Message) -> bool:
+    sender_id = message.sender_id
+    payload = message.payload
+    num_agents: int = agent.model.num_agents  # type: ignore
+    send = agent.send_to_successor
+
+    if agent.phase == 0:
+        """
+        Sanity check. Agent is joining the protocol here.
+        Represents `UponWaking`,
+        but the agent itself is not the originator.
+        """
+
+        agent.phase = 1
+        agent.highest = sender_id
+        agent.id_set = agent._with_own_id(payload)
+        agent.count = num_agents
+
+        first_collect_message = Message(
+            MessageType.COLLECT, agent.highest, agent.id_set
+        )
+        send(first_collect_message)
+
+    if agent.phase == 1 and sender_id > agent.highest:
+        """
+        FIRST MESSAGE PASS.
+        If the agent protocol is in the phase 1 but
+        the agent is not the message originator,
+        it just passes on the message to its' successor.
+        """
+
+        agent.highest = sender_id
+        agent.id_set = agent._with_own_id(payload)
+        agent.count = num_agents
+
+        new_collect_message = Message(MessageType.COLLECT, agent.highest, agent.id_set)
+        send(new_collect_message)
+
+    elif sender_id == agent.highest and agent.unique_id == sender_id:
+        """
+        First round trip of the message,
+        originator got its' message back.
+        Originator checks if the message round trip number
+        is equal to number of agents
+        and starts phase 2.
+        """
 
-            self.leader = int(sorted(list(self.id_set), reverse=True)[N])
+        if not (
+            payload.bit_count() == num_agents and agent.phase == 1 and agent.count == 0
+        ):
+            agent.leader = UniSyncAgent.PUNISH_STATE
+            return False
+
+        agent.phase = 2
+        agent.id_set = payload
+        agent.count = num_agents
+
+        setup_message = Message(MessageType.SETUP, sender_id, payload)
+        send(setup_message)
+
+    return True
+
+
+def _on_setup(agent: UniSyncAgent, message: Message) -> bool:
+    """
+    Agents check if the round trip of their
+    message is equal to number of agents.
+    Also, the sender of the message should be
+    the same as highest agent has seen (a.k.a. originator should've sent the message).
+    """
+
+    payload = message.payload
+    num_agents: int = agent.model.num_agents  # type: ignore
+
+    if agent.phase > 1:
+        return True
+
+    if not (
+        message.sender_id == agent.highest
+        and agent.phase == 1
+        and agent.count == 0
+        and payload.bit_count() == num_agents
+    ):
+        agent.leader = UniSyncAgent.PUNISH_STATE
+        return False
+
+    agent.phase = 2
+    agent.id_set = payload
+    agent.count = num_agents
+    agent.send_to_successor(message)
+    return True
+
+
+def _on_random(agent: UniSyncAgent, message: Message) -> bool:
+    """
+    Invokes sending a random number from message
+    originator to successor.
+    """
+
+    sender_id = message.sender_id
+    if not agent.received[sender_id]:
+        agent.all_N_rand[sender_id] = message.payload
+        agent.received[sender_id] = True
+        agent.send_to_successor(message)
+    return True
+
+
+_HANDLERS: dict[MessageType, Callable[[UniSyncAgent, Message], bool]] = {
+    MessageType.COLLECT: _on_collect,
+    MessageType.SETUP: _on_setup,
+    MessageType.RANDOM: _on_random,
+}
@@ -1,15 +1,23 @@
 import mesa
 import networkx as nx
+import numpy as np
+import pandas as pd
 
+from src.history import AgentHistory
 from src.uni_sync.agent import UniSyncAgent
-from src.uni_sync.types import Message
+from src.uni_sync.types import AGENT_DTYPE, Message, new_agent_state
 
 
 class UniSyncModel(mesa.Model):
-    def __init__(self, N: int) -> None:
+    def __init__(self, N: int, collect_data: bool = True) -> None:
         super().__init__()
 
         self.num_agents = N
+        self.collect_data = collect_data
+        self.leader_array = np.full(N, -1, dtype=np.int64)
+        self.state = new_agent_state(N)
+        # Column views into `state`, built once for the agents' StateFields.
+        self.state_columns = {name: self.state[name] for name in AGENT_DTYPE.names}
 
         graph = nx.DiGraph()
         for i in range(self.num_agents):
@@ -17,10 +25,13 @@ class UniSyncModel(mesa.Model):
 
         self.grid = mesa.space.NetworkGrid(graph)
 
+        # Indexed by unique_id; stepped directly rather than via `self.agents`.
+        self.agent_list: list[UniSyncAgent] = []
         for i in range(self.num_agents):
-            agent = UniSyncAgent(self)
+            agent = UniSyncAgent(self, row=i)
             agent.unique_id = i  # Ensure unique_id matches node id
             self.agents.add(agent)
+            self.agent_list.append(agent)
             self.grid.place_agent(agent, i)
 
         for i in range(self.num_agents):
@@ -28,35 +39,82 @@ class UniSyncModel(mesa.Model):
             target_agent_idx = (i + 1) % self.num_agents
 
             self.grid.G.add_edge(source_agent_idx, target_agent_idx)
-            self.agents[source_agent_idx].successor = self.agents[target_agent_idx]  # type: ignore
+            self.agent_list[source_agent_idx].successor = self.agent_list[
+                target_agent_idx
+            ]
+
+        # Agents that have not chosen a leader yet, in ring order.
+        self._active: dict[UniSyncAgent, None] = dict.fromkeys(self.agent_list)
 
         self.current_round_messages: dict[int, list[Message]] = {
-            agent.unique_id: [] for agent in self.agents
+            agent.unique_id: [] for agent in self.agent_list
         }
 
-        starter_agent = self.random.choice(self.agents)
-        starter_agent.start_protocol()  # type: ignore
+        starter_agent = self.random.choice(self.agent_list)
+        starter_agent.start_protocol()
 
-        self.datacollector = mesa.DataCollector(
-            agent_reporters={
-                "Phase": "phase",
-                "Random number": "N_rand",
-                "Leader": "leader",
-            }
-        )
+        # One copy of `state` per step; grown by doubling.
+        self._history = np.empty((64, N), dtype=AGENT_DTYPE)
+        self._history_len = 0
+        # Kept for callers of `model.datacollector.get_agent_vars_dataframe()`.
+        self.datacollector = AgentHistory(self)
+
+    def register_leader_report(self, agent_id: int, leader_id: int) -> None:
+        self.leader_array[agent_id] = leader_id
+        self._active.pop(self.agent_list[agent_id], None)
 
     def buffer_message(self, agent: UniSyncAgent, message: Message):
         self.current_round_messages[agent.unique_id].append(message)
 
     def step(self) -> None:
-        for agent in self.agents:
-            agent.inbox.extend(self.current_round_messages[agent.unique_id])  # type: ignore
-            self.current_round_messages[agent.unique_id].clear()
-
-        self.agents.do("step")
-        self.datacollector.collect(self)
+        # Double-buffered: last round's messages become the inbox and the old
+        # inbox is emptied and reused as the buffer for this round.
+        buffers = self.current_round_messages
+        for agent in self.agent_list:
+            uid = agent.unique_id
+            agent.inbox, buffers[uid] = buffers[uid], agent.inbox
+            buffers[uid].clear()
+
+        # Every agent still in the protocol counts down one round.
+        counting = (self.state["phase"] > 0) & (self.state["leader"] < 0)
+        self.state["count"][counting] -= 1
+
+        for agent in list(self._active):
+            agent.step()
+        if self.collect_data:
+            self._record_history()
+
+    def _record_history(self) -> None:
+        if self._history_len == len(self._history):
+            self._history = np.concatenate(
+                [self._history, np.empty_like(self._history)]
+            )
+        self._history[self._history_len] = self.state
+        self._history_len += 1
+
+    def get_agent_vars_dataframe(self) -> pd.DataFrame:
+        """Per-step agent state, indexed by (Step, AgentID) like Mesa's DataCollector.
+
+        Columns are int64; unset values (no leader, no random number) are -1
+        rather than NaN.
+        """
+
+        history = self._history[: self._history_len]
+        steps, agent_ids = np.indices(history.shape)
+        index = pd.MultiIndex.from_arrays(
+            [steps.ravel() + 1, agent_ids.ravel()], names=["Step", "AgentID"]
+        )
+        return pd.DataFrame(
+            {
+                "Phase": history["phase"].ravel(),
+                "Random number": history["N_rand"].ravel(),
+                "Leader": history["leader"].ravel(),
+            },
+            index=index,
+            dtype=np.int64,
+        )
 
     def all_agents_finished(self) -> None:
         """Check if all agents have chosen a leader or failed."""
 
-        return all(agent.leader is not None for agent in self.agents)  # type: ignore
+        return not self._active
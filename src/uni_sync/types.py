@@ -1,14 +1,38 @@
-from enum import Enum
-from typing import Any, TypedDict
+from enum import IntEnum
+from typing import Any, NamedTuple
 
+import numpy as np
 
-class MessageType(str, Enum):
-    COLLECT = "Collect"
-    SETUP = "Setup"
-    RANDOM = "Random"
 
+class MessageType(IntEnum):
+    COLLECT = 0
+    SETUP = 1
+    RANDOM = 2
 
-class Message(TypedDict):
+
+class Message(NamedTuple):
     message_type: MessageType
     sender_id: int
     payload: Any
+
+
+# Per-agent protocol state, stored column-wise on the model.
+AGENT_DTYPE = np.dtype(
+    [
+        ("phase", "i1"),  # Current protocol phase.
+        ("highest", "i4"),  # Highest message originator seen.
+        ("count", "i4"),  # Message trip count.
+        ("leader", "i4"),  # -1 until a leader is chosen.
+        ("N_rand", "i4"),
+    ]
+)
+
+
+def new_agent_state(N: int) -> np.ndarray:
+    """Allocate state for `N` agents that have not joined the protocol yet."""
+
+    state = np.zeros(N, dtype=AGENT_DTYPE)
+    state["highest"] = -1
+    state["leader"] = -1
+    state["N_rand"] = -1
+    return state
@@ -4,7 +4,9 @@ from typing import Any
 import matplotlib.pyplot as plt
 import networkx as nx
 
+from src.bitmask import bitmask_ids
 from src.uni_sync.model import UniSyncModel
+from src.uni_sync.types import MessageType
 
 
 def visualize_leader_election(num_agents: int = 5, max_steps: int = 30) -> None:
@@ -27,12 +29,9 @@ def visualize_leader_election(num_agents: int = 5, max_steps: int = 30) -> None:
         for node in G.nodes:
             agent = node_to_agent.get(node)
             if agent is not None:
-                labels[node] = (
-                    str(node)
-                    + f"(L: {agent.leader if agent.leader is not None else -1})"
-                )
+                labels[node] = str(node) + f"(L: {agent.leader})"
 
-                if agent.leader is not None:
+                if agent.leader >= 0:
                     if agent.leader == agent.unique_id:
                         colors.append("gold")  # Leader
                     else:
@@ -60,9 +59,12 @@ def visualize_leader_election(num_agents: int = 5, max_steps: int = 30) -> None:
 
         for agent_rec_id, messages in model.current_round_messages.items():
             for message in messages:
-                sender_id = message["sender_id"]
+                sender_id = message.sender_id
                 highlighted_edges.append((sender_id, agent_rec_id))
-                edge_labels[(sender_id, agent_rec_id)] = message["payload"]
+                payload = message.payload
+                if message.message_type != MessageType.RANDOM:
+                    payload = set(bitmask_ids(payload))  # Id bitmask.
+                edge_labels[(sender_id, agent_rec_id)] = payload
 
         # Draw highlighted edges (red and thicker)
         if highlighted_edges: